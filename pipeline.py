@@ -1,9 +1,7 @@
 #!/usr/bin/env python3
 import os
 import sys
-import time
 import subprocess
-import glob
 import argparse
 import pandas as pd
 import re
@@ -11,25 +9,53 @@ import numpy as np
 from datetime import datetime
 import shutil
 import json
+import csv
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
 
 # Import score calculation functionality
 # sys.path.append('./scores')
-from score_calculation import process_csv_row, process_distilled_factors, count_factor_mismatches, count_factor_weaknesses
+from score_calculation import process_csv_row, process_distilled_factors, count_factor_diffs
+
+# Columns of the messages CSV written from the response log
+_MESSAGE_COLUMNS = ['scenario', 'argument', 'distilled_factors']
+
+# Modes where the model is expected to abstain from arguing
+_ABSTENTION_MODES = frozenset({'non-arguable', 'unarguable'})
+
+# Below this many rows, process start-up costs more than scoring the rows serially
+_PARALLEL_MIN_ROWS = 500
+
+# Input filename convention: {mode}_factor_{number}_complexity{level}, optionally with an
+# output-file prefix and a trailing timestamp
+_FILENAME_RE = re.compile(
+    r'^(?:formatted_)?'
+    r'(?:messages_factor_|messages_|extracted_|decoded_|input_file_report_|report_existing_|factor_report_)?'
+    r'(?P<mode>[^_]+)_factor_(?P<number>[^_]+)_complexity(?P<complexity>\d+)'
+)
+
+# Directories created during this run
+_ensured_dirs = set()
+
+# Filenames already reported as not following the naming convention
+_unparsed_filenames = set()
 
 def run_command(command, description=None):
-    """Run a shell command and print its output"""
+    """Run a shell command, streaming its output to the terminal"""
+    # Emit the header in one write and flush it before the child starts writing
+    buf = []
     if description:
-        print(f"\n{description}")
-        print("=" * 80)
-    
-    print(f"Running: {' '.join(command)}")
-    result = subprocess.run(command, capture_output=True, text=True)
-    
-    if result.stdout:
-        print(result.stdout)
-    
-    if result.stderr:
-        print(f"ERROR: {result.stderr}", file=sys.stderr)
+        buf.append(f"\n{description}\n")
+        buf.append("=" * 80 + "\n")
+    buf.append(f"Running: {' '.join(command)}\n")
+    sys.stdout.write(''.join(buf))
+    sys.stdout.flush()
+    # The child writes straight to our stdout/stderr so progress shows up as it happens.
+    # Files opened by Python are non-inheritable, so skipping the close-fds loop is safe
+    # and lets CPython launch the child with posix_spawn
+    result = subprocess.run(command, close_fds=False)
     
     if result.returncode != 0:
         print(f"Command failed with exit code {result.returncode}", file=sys.stderr)
@@ -37,56 +63,108 @@ def run_command(command, description=None):
     
     return result
 
+def _ensure_dir(path):
+    """Create path (and parents) unless it was already created during this run"""
+    path = os.fspath(path)
+    if path in _ensured_dirs:
+        return
+    os.makedirs(path, exist_ok=True)
+    _ensured_dirs.add(path)
+
+def _latest(directory, prefix, suffix):
+    """Return (path, mtime_ns) of the most recently modified file in directory matching prefix/suffix"""
+    best = None
+    best_t = -1
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return best, best_t
+    with entries:
+        for entry in entries:
+            if entry.name.startswith(prefix) and entry.name.endswith(suffix) and entry.is_file():
+                t = entry.stat().st_mtime_ns
+                if t > best_t:
+                    best_t = t
+                    best = entry.path
+    return best, best_t
+
+def _find_latest_messages(model_dir):
+    """Return the newest messages_factor_*.csv in a model_dir subfolder or the current directory"""
+    best = None
+    best_t = -1
+    try:
+        with os.scandir(model_dir) as entries:
+            directories = [entry.path for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        directories = []
+    directories.append(".")
+    
+    for directory in directories:
+        path, t = _latest(directory, "messages_factor_", ".csv")
+        if t > best_t:
+            best_t = t
+            best = path
+    return best
+
 def extract_json_to_csv(json_file, csv_output):
-    """Convert the JSON log file to CSV format"""
+    """Convert the JSON log file to CSV format and return the extracted (scenario, argument, distilled_factors) rows"""
     print(f"\nExtracting data from JSON log: {json_file}")
     
     try:
-        with open(json_file, 'r') as f:
-            log_data = json.load(f)
-        
-        messages = []
-        for entry in log_data:
+        with open(json_file, 'rb') as f:
+            # The response log is JSON Lines: one record per line
+            log_data = (json.loads(line) for line in f if line.strip())
             # Each entry should have scenario, argument, and distilled_factors
-            messages.append({
-                'scenario': entry.get('scenario', ''),
-                'argument': entry.get('argument', ''),
-                'distilled_factors': entry.get('distilled_factors', '')
-            })
+            messages = [(entry.get('scenario') or '', entry.get('argument') or '', entry.get('distilled_factors') or '')
+                        for entry in log_data]
         
-        messages_df = pd.DataFrame(messages)
-        if not messages_df.empty:
-            messages_df.to_csv(csv_output, index=False)
+        if messages:
+            with open(csv_output, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(_MESSAGE_COLUMNS)
+                writer.writerows(messages)
             print(f"Data extracted to {csv_output}")
         else:
             print(f"WARNING: No messages extracted from JSON file {json_file}")
         
-        return messages_df
+        return messages
     
     except Exception as e:
         print(f"Error extracting data from JSON file: {e}")
-        return pd.DataFrame()
+        return []
 
+@lru_cache(maxsize=256)
 def extract_info_from_filename(filename):
-    """Extract mode, format, number and complexity from a filename"""
+    """Extract mode, format, number and complexity from a filename.
+
+    Results are cached per filename and returned read-only; copy with dict() before modifying.
+    """
+    return MappingProxyType(_parse_filename(filename))
+
+def _parse_filename(filename):
+    """Parse mode, format, number and complexity out of a filename"""
     try:
         basename = os.path.basename(filename)
         basename = os.path.splitext(basename)[0] if '.' in basename else basename
         
-        if basename.startswith('formatted_'):
-            basename = basename[len('formatted_'):]
-        
-        pattern = r'([^_]+)_factor_([^_]+)_complexity(\\d+)'
-        match = re.match(pattern, basename)
+        match = _FILENAME_RE.match(basename)
         
         if match:
             return {
-                'mode': match.group(1),
+                'mode': match['mode'],
                 'format': 'factor',
-                'number': match.group(2),
-                'complexity': match.group(3)
+                'number': match['number'],
+                'complexity': match['complexity']
             }
         
+        # Slow path for names that don't follow the convention
+        if filename not in _unparsed_filenames:
+            _unparsed_filenames.add(filename)
+            print(f"Warning: {filename} does not follow the {{mode}}_factor_{{number}}_complexity{{level}} naming convention")
+        
+        if basename.startswith('formatted_'):
+            basename = basename[len('formatted_'):]
+        
         parts = basename.split('_')
         # Expected: messages_mode_factor_number_complexity... or mode_factor_number_complexity...
         # Or for older/other files: prefix_mode_factor_num_complexity...
@@ -155,15 +233,52 @@ def extract_info_from_filename(filename):
         'complexity': '0'
     }
 
-def calculate_scores(csv_file, override_file_info=None):
-    """Calculate accuracy scores using the Score_Calculation module"""
-    print(f"\nCalculating scores for: {csv_file}")
-    print("=" * 50)
+@lru_cache(maxsize=4096)
+def _cached_process_csv_row(row_text):
+    """Parse scenario text once per unique scenario, returning (factors, total_factor_count)"""
+    input_factors = process_csv_row(row_text)
+    return input_factors, sum(len(factors) for factors in input_factors.values())
+
+@lru_cache(maxsize=4096)
+def _cached_process_distilled_factors(row_text):
+    """Parse distilled factors text once per unique response"""
+    return process_distilled_factors(row_text)
+
+def _count_row(scenario, distilled_factors_val):
+    """Parse a single scenario row and return its factor, mismatch and weakness counts"""
+    input_factors, total_factors_in_row = _cached_process_csv_row(str(scenario))
+    distilled_factors = _cached_process_distilled_factors(str(distilled_factors_val))
+    
+    mismatches, weaknesses, (orig_factors, dist_factors) = count_factor_diffs(input_factors, distilled_factors)
+    
+    return (total_factors_in_row, orig_factors, dist_factors, sum(mismatches), sum(weaknesses))
+
+def _count_rows(rows):
+    """Count factors for a chunk of (scenario, distilled_factors) rows"""
+    return [_count_row(scenario, distilled_factors_val) for scenario, distilled_factors_val in rows]
+
+def calculate_scores(csv_file, override_file_info=None, workers=1):
+    """Calculate accuracy scores using the Score_Calculation module
+
+    csv_file is either a CSV path or an already-loaded DataFrame; a DataFrame needs override_file_info.
+    """
+    if isinstance(csv_file, pd.DataFrame):
+        print(f"\nCalculating scores for: {len(csv_file)} in-memory rows")
+        print("=" * 50)
+        if override_file_info is None:
+            raise ValueError("override_file_info is required when scoring a DataFrame")
+        df = csv_file.copy(deep=False)
+    else:
+        print(f"\nCalculating scores for: {csv_file}")
+        print("=" * 50)
+        # Only the scenario and distilled factors columns are scored; read them as plain strings
+        df = pd.read_csv(csv_file, usecols=lambda c: c.strip().lower() in {'scenario', 'distilled_factors'},
+                         dtype='string', na_filter=False)
     
     file_info = override_file_info or extract_info_from_filename(csv_file)
     mode = file_info['mode']
+    is_abstention_mode = mode.lower() in _ABSTENTION_MODES
     
-    df = pd.read_csv(csv_file)
     total_rows = len(df)
     
     # Normalize column names by stripping whitespace and converting to lowercase
@@ -172,68 +287,56 @@ def calculate_scores(csv_file, override_file_info=None):
     # Handle the case when the original CSV only has 'scenario' column
     if 'scenario' in df.columns and 'distilled_factors' not in df.columns:
         df['distilled_factors'] = "{}"  # Add empty JSON objects as distilled factors
+    else:
+        # Missing values are empty strings (na_filter=False, or blanks from the response log)
+        df['distilled_factors'] = df['distilled_factors'].replace('', '{}')
+    
+    # Parse every row once into per-metric count arrays
+    rows = list(zip(df['scenario'], df['distilled_factors']))
+    if workers > 1 and total_rows >= _PARALLEL_MIN_ROWS:
+        print(f"Scoring {total_rows} rows with {workers} worker processes")
+        chunk_size = -(-total_rows // workers)
+        chunks = [rows[i:i + chunk_size] for i in range(0, total_rows, chunk_size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            counts = [row_counts for chunk_counts in executor.map(_count_rows, chunks) for row_counts in chunk_counts]
+    else:
+        counts = _count_rows(rows)
+        # The parse caches live in this process only on the serial path
+        cache_info = _cached_process_csv_row.cache_info()
+        lookups = cache_info.hits + cache_info.misses
+        if lookups:
+            print(f"Scenario parse cache: {cache_info.hits}/{lookups} hits ({cache_info.hits / lookups * 100:.1f}%)")
+    factors, orig, dist, mism, weak = np.array(counts, dtype=np.int64).reshape(total_rows, 5).T
+    
+    # Rows without factors score 0 accuracy
+    accuracies = np.where(factors > 0, 1 - mism / np.maximum(factors, 1), 0.0)
+    
+    # Calculate strength based on mode
+    if is_abstention_mode:
+        # For non-arguable/unarguable mode: 1 - distilled_factors/original_factors. Without original factors, strength is 1 if nothing was distilled, else 0.
+        strengths = np.where(orig > 0, 1 - dist / np.maximum(orig, 1), (dist == 0).astype(np.float64))
+    else:
+        # For arguable and other modes: 1 - total_weaknesses/total_factors
+        strengths = np.where(factors > 0, 1 - weak / np.maximum(factors, 1), 0.0)
     
-    all_accuracies = []
-    all_strengths = []
-    all_factors = 0
-    all_mismatches = 0
-    all_weaknesses = 0
-    all_original_factors = 0
-    all_distilled_factors = 0
-    successful_abstention_count = 0
-    
-    # Process each row
-    for _, row in df.iterrows():
-        input_factors = process_csv_row(row['scenario'])
-        distilled_factors_val = row.get('distilled_factors', '{}')
-        if pd.isna(distilled_factors_val): # Handle NaN values if any
-            distilled_factors_val = '{}'
-        distilled_factors = process_distilled_factors(distilled_factors_val)
-        
-        input_mismatches, tsc1_mismatches, tsc2_mismatches, orig_factors, dist_factors = count_factor_mismatches(input_factors, distilled_factors)
-        total_mismatches = input_mismatches + tsc1_mismatches + tsc2_mismatches
-        
-        # Add call to count_factor_weaknesses function
-        input_weakness, tsc1_weakness, tsc2_weakness, _, _ = count_factor_weaknesses(input_factors, distilled_factors)
-        total_weaknesses = input_weakness + tsc1_weakness + tsc2_weakness
-        
-        total_factors_in_row = sum(len(factors) for factors in input_factors.values()) # Renamed to avoid conflict
-        accuracy = 1 - total_mismatches / total_factors_in_row if total_factors_in_row > 0 else 0
-        
-        if total_weaknesses == 0 and dist_factors == 0 : # Successful abstention means no distilled factors and no weaknesses
-            successful_abstention_count += 1
-        
-        # Calculate strength based on mode
-        if mode.lower() in ['non-arguable', 'unarguable']:
-            # For non-arguable/unarguable mode: 1 - distilled_factors/original_factors if original_factors > 0, else 0. If distilled is 0, strength is 1.
-            if orig_factors > 0:
-                strength = 1 - (dist_factors / orig_factors)
-            elif dist_factors == 0 : # No original factors, no distilled factors
-                strength = 1.0
-            else: # No original factors, but some distilled factors
-                strength = 0.0
-        else:
-            # For arguable and other modes: 1 - total_weaknesses/total_factors
-            strength = 1 - total_weaknesses / total_factors_in_row if total_factors_in_row > 0 else 0
-        
-        all_accuracies.append(accuracy * 100)
-        all_strengths.append(strength * 100)
-        all_factors += total_factors_in_row
-        all_mismatches += total_mismatches
-        all_weaknesses += total_weaknesses
-        all_original_factors += orig_factors
-        all_distilled_factors += dist_factors
+    # Successful abstention means no distilled factors and no weaknesses
+    successful_abstention_count = int(((weak == 0) & (dist == 0)).sum())
+    
+    all_mismatches = int(mism.sum())
+    all_weaknesses = int(weak.sum())
+    all_original_factors = int(orig.sum())
+    all_distilled_factors = int(dist.sum())
     
     # Calculate and print results
-    mean_acc = np.mean(all_accuracies) if all_accuracies else 0
-    mean_strength = np.mean(all_strengths) if all_strengths else 0
+    mean_acc = np.mean(accuracies * 100) if total_rows > 0 else 0
+    mean_strength = np.mean(strengths * 100) if total_rows > 0 else 0
     successful_abstention_ratio = successful_abstention_count / total_rows * 100 if total_rows > 0 else 0
     
     print("\n## Accuracy Results\n")
     header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Total Mismatches | Total Weaknesses | Accuracy (%) | Strength (%) "
     separator = "|------|--------|--------|------------|------------------|-------------------|------------------|------------------|--------------|--------------"
     
-    if mode.lower() in ['non-arguable', 'unarguable']:
+    if is_abstention_mode:
         header += "| Successful Abstention Ratio (%) "
         separator += "|---------------------------------"
     
@@ -243,7 +346,7 @@ def calculate_scores(csv_file, override_file_info=None):
     print(separator)
     
     row_data = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {all_original_factors} | {all_distilled_factors} | {all_mismatches} | {all_weaknesses} | {mean_acc:.2f}% | {mean_strength:.2f}% "
-    if mode.lower() in ['non-arguable', 'unarguable']:
+    if is_abstention_mode:
         row_data += f"| {successful_abstention_ratio:.2f}% "
     row_data += "|"
     print(row_data)
@@ -256,7 +359,7 @@ def calculate_scores(csv_file, override_file_info=None):
         'total_mismatches': all_mismatches,
         'total_weaknesses': all_weaknesses
     }
-    if mode.lower() in ['non-arguable', 'unarguable']:
+    if is_abstention_mode:
         result_data['successful_abstention_ratio'] = successful_abstention_ratio
 
     return {
@@ -264,14 +367,10 @@ def calculate_scores(csv_file, override_file_info=None):
         'file_info': file_info
     }
 
-def process_factor_agent_output(model_dir, timestamp, file_info, args, standard_filename):
-    """Process output from the factor-based agent"""
+def process_factor_agent_output(scenario_dir, timestamp, file_info, args, standard_filename):
+    """Process output from the factor-based agent into the (already created) scenario directory"""
     results = {}
     
-    # Get the scenario directory
-    scenario_dir = f"{model_dir}/{standard_filename}"
-    os.makedirs(scenario_dir, exist_ok=True)
-    
     # Build command with arguments
     command = [
         "python", 
@@ -285,37 +384,34 @@ def process_factor_agent_output(model_dir, timestamp, file_info, args, standard_
     
     run_command(command, "STEP 1: Running argument generation with single_agent_factor.py")
     
-    print("Waiting for log file to be written...")
-    time.sleep(2)  # Give time for file writing
+    # run_command waits for the child to exit, so its log file is already flushed and closed
+    # Find the most recent log file for factor agent (JSON Lines)
+    latest_json, _ = _latest(".", "single_agent_factor_responses_", ".jsonl")
     
-    # Find the most recent log file for factor agent (JSON)
-    json_files = glob.glob("single_agent_factor_responses_*.json")
-    
-    if not json_files:
+    if latest_json is None:
         print("No factor JSON log files found!")
         return None
         
-    latest_json = max(json_files, key=os.path.getctime)
     print(f"\nUsing most recent factor log: {latest_json}")
     
     # Create unique file name using the run_id
-    messages_csv = f"{scenario_dir}/messages_factor_{standard_filename}_{timestamp}.csv"
+    messages_csv = scenario_dir / f"messages_factor_{standard_filename}_{timestamp}.csv"
     
     # Convert JSON log to CSV
-    messages_df = extract_json_to_csv(latest_json, messages_csv)
+    messages = extract_json_to_csv(latest_json, messages_csv)
     
-    if messages_df.empty:
+    if not messages:
         print("WARNING: No messages were extracted from the log. Skipping further processing.")
         return None
     
     # The output of factor agent is already "decoded" (i.e., uses full factor names)
-    # So, the extracted CSV is the one to use for scoring
-    processed_csv_for_scoring = messages_csv
-    print(f"Using extracted results for scoring: {processed_csv_for_scoring}")
+    # So, the extracted rows are scored directly; the CSV above is kept for provenance
+    print(f"Using extracted results for scoring: {messages_csv}")
+    messages_df = pd.DataFrame(messages, columns=_MESSAGE_COLUMNS, dtype='string')
         
     # Calculate scores
     print(f"\nCalculating scores for factor results with mode: {file_info['mode']}")
-    agent_results = calculate_scores(processed_csv_for_scoring, override_file_info=file_info)
+    agent_results = calculate_scores(messages_df, override_file_info=file_info, workers=args.workers)
     
     # Clean up the JSON log file, unless --keep-logs is specified
     if not args.keep_logs:
@@ -329,11 +425,8 @@ def process_factor_agent_output(model_dir, timestamp, file_info, args, standard_
 
     return agent_results
 
-def save_results_to_markdown(results, model_dir, timestamp, standard_filename, args):
-    """Save results to markdown file"""
-    # Get the scenario directory
-    scenario_dir = f"{model_dir}/{standard_filename}"
-    os.makedirs(scenario_dir, exist_ok=True)
+def save_results_to_markdown(results, scenario_dir, timestamp, standard_filename, args):
+    """Save results to markdown file in the (already created) scenario directory"""
 
     if not results:
         print("No results to save to markdown.")
@@ -364,54 +457,56 @@ def save_results_to_markdown(results, model_dir, timestamp, standard_filename, a
         
     result_data_for_mode = results[mode_key]
     mode = file_info['mode'] # Use mode from file_info for consistency
+    is_abstention_mode = mode.lower() in _ABSTENTION_MODES
 
-    markdown_report = f"{scenario_dir}/factor_report_{standard_filename}_{timestamp}.md"
-    
-    with open(markdown_report, 'w') as f:
-        f.write(f"# Legal Argument Generation Results (Factor-Based)\n\n")
-        f.write(f"Model: {args.model}\n")
-        f.write(f"Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("## Scenario Information\n\n")
-        f.write(f"- Mode: {file_info['mode']}\n")
-        f.write(f"- Format: {file_info['format']}\n") # Should always be 'factor'
-        f.write(f"- Number: {file_info['number']}\n")
-        f.write(f"- Complexity: {file_info['complexity']}\n\n")
-        f.write("## Accuracy Results\n\n")
-        
-        header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Total Mismatches | Total Weaknesses | Accuracy (%) | Strength (%) "
-        separator = "|------|--------|--------|------------|------------------|-------------------|------------------|------------------|--------------|--------------"
-        
-        if mode.lower() in ['non-arguable', 'unarguable']:
-            header += "| Successful Abstention Ratio (%) "
-            separator += "|---------------------------------"
-        
-        header += "|"
-        separator += "|"
-        f.write(header + "\n")
-        f.write(separator + "\n")
-        
-        # Fetch total_mismatches and total_weaknesses from result_data_for_mode if available
-        # These were calculated in calculate_scores and should be part of the returned dict for that mode.
-        # The calculate_scores function returns: {mode: result_data, 'file_info': file_info}
-        # where result_data is: {'accuracy': mean_acc, 'strength': mean_strength, 'original_factors': all_original_factors, 'distilled_factors': all_distilled_factors, 'total_mismatches': all_mismatches, 'total_weaknesses': all_weaknesses}
-        # The 'results' dict passed to this function (save_results_to_markdown) should be structured as:
-        # { 'actual_mode_name': { 'accuracy': ..., 'strength': ..., 'original_factors': ..., 'distilled_factors': ..., 'total_mismatches': ..., 'total_weaknesses': ... }, 'file_info': { ... } }
-
-        total_mismatches = result_data_for_mode.get('total_mismatches', 'N/A')
-        total_weaknesses = result_data_for_mode.get('total_weaknesses', 'N/A')
-
-        row_content = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {result_data_for_mode['original_factors']} | {result_data_for_mode['distilled_factors']} | {total_mismatches} | {total_weaknesses} | {result_data_for_mode['accuracy']:.2f} | {result_data_for_mode['strength']:.2f} "
-        if mode.lower() in ['non-arguable', 'unarguable']:
-            sar_value = result_data_for_mode.get('successful_abstention_ratio', 0)
-            row_content += f"| {sar_value:.2f}% "
-        row_content += "|"
-        f.write(row_content + "\n")
+    markdown_report = scenario_dir / f"factor_report_{standard_filename}_{timestamp}.md"
+    
+    parts = []
+    parts.append(f"# Legal Argument Generation Results (Factor-Based)\n\n")
+    parts.append(f"Model: {args.model}\n")
+    parts.append(f"Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    parts.append("## Scenario Information\n\n")
+    parts.append(f"- Mode: {file_info['mode']}\n")
+    parts.append(f"- Format: {file_info['format']}\n") # Should always be 'factor'
+    parts.append(f"- Number: {file_info['number']}\n")
+    parts.append(f"- Complexity: {file_info['complexity']}\n\n")
+    parts.append("## Accuracy Results\n\n")
+    
+    header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Total Mismatches | Total Weaknesses | Accuracy (%) | Strength (%) "
+    separator = "|------|--------|--------|------------|------------------|-------------------|------------------|------------------|--------------|--------------"
+    
+    if is_abstention_mode:
+        header += "| Successful Abstention Ratio (%) "
+        separator += "|---------------------------------"
+    
+    header += "|"
+    separator += "|"
+    parts.append(header + "\n")
+    parts.append(separator + "\n")
+    
+    # Fetch total_mismatches and total_weaknesses from result_data_for_mode if available
+    # These were calculated in calculate_scores and should be part of the returned dict for that mode.
+    # The calculate_scores function returns: {mode: result_data, 'file_info': file_info}
+    # where result_data is: {'accuracy': mean_acc, 'strength': mean_strength, 'original_factors': all_original_factors, 'distilled_factors': all_distilled_factors, 'total_mismatches': all_mismatches, 'total_weaknesses': all_weaknesses}
+    # The 'results' dict passed to this function (save_results_to_markdown) should be structured as:
+    # { 'actual_mode_name': { 'accuracy': ..., 'strength': ..., 'original_factors': ..., 'distilled_factors': ..., 'total_mismatches': ..., 'total_weaknesses': ... }, 'file_info': { ... } }
+
+    total_mismatches = result_data_for_mode.get('total_mismatches', 'N/A')
+    total_weaknesses = result_data_for_mode.get('total_weaknesses', 'N/A')
+
+    row_content = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {result_data_for_mode['original_factors']} | {result_data_for_mode['distilled_factors']} | {total_mismatches} | {total_weaknesses} | {result_data_for_mode['accuracy']:.2f} | {result_data_for_mode['strength']:.2f} "
+    if is_abstention_mode:
+        sar_value = result_data_for_mode.get('successful_abstention_ratio', 0)
+        row_content += f"| {sar_value:.2f}% "
+    row_content += "|"
+    parts.append(row_content + "\n")
+    markdown_report.write_text(''.join(parts))
     
     print(f"\nFactor report saved to: {markdown_report}")
 
 def process_input_file(args, model_dir, timestamp):
     """Process a provided input file (assumed to be factor format)"""
-    file_info = extract_info_from_filename(args.input_file)
+    file_info = dict(extract_info_from_filename(args.input_file))
     # Ensure format is 'factor' after extraction or override
     if file_info['format'] != 'factor':
         print(f"Warning: Input file {args.input_file} detected as format '{file_info['format']}'. Forcing to 'factor'.")
@@ -424,8 +519,8 @@ def process_input_file(args, model_dir, timestamp):
     standard_filename = f"{file_info['mode']}_{file_info['format']}_{file_info['number']}_complexity{file_info['complexity']}"
     
     # Create a unique subfolder for this scenario
-    scenario_dir = f"{model_dir}/{standard_filename}"
-    os.makedirs(scenario_dir, exist_ok=True)
+    scenario_dir = Path(model_dir) / standard_filename
+    _ensure_dir(scenario_dir)
     
     # Input file is used directly for scoring as it's factor-based
     target_file = args.input_file
@@ -433,7 +528,7 @@ def process_input_file(args, model_dir, timestamp):
     
     # Calculate scores using the file_info
     # calculate_scores now returns a dict like: {'mode_name': {scores...}, 'file_info': {info}}
-    score_results_dict = calculate_scores(target_file, override_file_info=file_info)
+    score_results_dict = calculate_scores(target_file, override_file_info=file_info, workers=args.workers)
     
     # Extract the actual scores for the mode
     # The mode_name key (e.g., 'non-arguable') is the first key in score_results_dict that isn't 'file_info'
@@ -441,36 +536,37 @@ def process_input_file(args, model_dir, timestamp):
     mode_scores = score_results_dict[mode_key_from_scores]
 
     # Create markdown report
-    markdown_report = f"{scenario_dir}/input_file_report_{standard_filename}_{timestamp}.md"
-    with open(markdown_report, 'w') as f:
-        f.write(f"# Input File Analysis Report\n\n")
-        f.write(f"Model: Not Applicable (Direct File Analysis)\n")
-        f.write(f"Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("## Scenario Information\n\n")
-        f.write(f"- Source File: {os.path.basename(args.input_file)}\n")
-        f.write(f"- Mode: {file_info['mode']}\n")
-        f.write(f"- Format: {file_info['format']}\n")
-        f.write(f"- Number: {file_info['number']}\n")
-        f.write(f"- Complexity: {file_info['complexity']}\n\n")
-        
-        f.write("## Score Results\n\n")
-        header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Accuracy (%) | Strength (%) "
-        separator = "|------|--------|--------|------------|------------------|-------------------|--------------|---------------"
-        values_row = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {mode_scores['original_factors']} | {mode_scores['distilled_factors']} | {mode_scores['accuracy']:.2f} | {mode_scores['strength']:.2f} "
-
-        if file_info['mode'].lower() in ['non-arguable', 'unarguable']:
-            header += "| Successful Abstention Ratio (%) "
-            separator += "|---------------------------------"
-            values_row += f"| {mode_scores.get('successful_abstention_ratio', 0):.2f}% "
-        
-        header += "|"
-        separator += "|"
-        values_row += "|"
+    markdown_report = scenario_dir / f"input_file_report_{standard_filename}_{timestamp}.md"
+    parts = []
+    parts.append(f"# Input File Analysis Report\n\n")
+    parts.append(f"Model: Not Applicable (Direct File Analysis)\n")
+    parts.append(f"Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    parts.append("## Scenario Information\n\n")
+    parts.append(f"- Source File: {os.path.basename(args.input_file)}\n")
+    parts.append(f"- Mode: {file_info['mode']}\n")
+    parts.append(f"- Format: {file_info['format']}\n")
+    parts.append(f"- Number: {file_info['number']}\n")
+    parts.append(f"- Complexity: {file_info['complexity']}\n\n")
+    
+    parts.append("## Score Results\n\n")
+    header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Accuracy (%) | Strength (%) "
+    separator = "|------|--------|--------|------------|------------------|-------------------|--------------|---------------"
+    values_row = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {mode_scores['original_factors']} | {mode_scores['distilled_factors']} | {mode_scores['accuracy']:.2f} | {mode_scores['strength']:.2f} "
+
+    if file_info['mode'].lower() in _ABSTENTION_MODES:
+        header += "| Successful Abstention Ratio (%) "
+        separator += "|---------------------------------"
+        values_row += f"| {mode_scores.get('successful_abstention_ratio', 0):.2f}% "
+    
+    header += "|"
+    separator += "|"
+    values_row += "|"
 
-        f.write(header + "\n")
-        f.write(separator + "\n")
-        f.write(values_row + "\n\n")
-        f.write(f"Analyzed input file: {os.path.basename(args.input_file)}\n\n")
+    parts.append(header + "\n")
+    parts.append(separator + "\n")
+    parts.append(values_row + "\n\n")
+    parts.append(f"Analyzed input file: {os.path.basename(args.input_file)}\n\n")
+    markdown_report.write_text(''.join(parts))
     
     print(f"\nReport saved to: {markdown_report}")
     return file_info, standard_filename
@@ -478,19 +574,15 @@ def process_input_file(args, model_dir, timestamp):
 def process_existing_files(model_dir, timestamp, args):
     """Process existing extracted factor files"""
     # Look for messages_factor_...csv files as these are the direct output before scoring
-    search_pattern_model_dir = f"{model_dir}/*/messages_factor_*.csv" # Check subfolders in model_dir
-    search_pattern_root = "messages_factor_*.csv" # Check root directory
-
-    existing_files = glob.glob(search_pattern_model_dir) + glob.glob(search_pattern_root)
+    latest_extracted_file = _find_latest_messages(model_dir)
     
-    if not existing_files:
+    if latest_extracted_file is None:
         print("No existing 'messages_factor_*.csv' files found to process!")
         return None, None
         
-    latest_extracted_file = max(existing_files, key=os.path.getctime)
     print(f"Found latest extracted factor file: {latest_extracted_file}")
     
-    file_info = extract_info_from_filename(latest_extracted_file)
+    file_info = dict(extract_info_from_filename(latest_extracted_file))
     # Ensure format is 'factor'
     if file_info['format'] != 'factor':
         print(f"Warning: File {latest_extracted_file} detected as format '{file_info['format']}'. Forcing to 'factor'.")
@@ -502,50 +594,51 @@ def process_existing_files(model_dir, timestamp, args):
     # If file was found in a subfolder of model_dir, use that subfolder
     # Otherwise, create a new one.
     if os.path.dirname(latest_extracted_file).startswith(model_dir) and os.path.dirname(latest_extracted_file) != model_dir:
-        scenario_dir = os.path.dirname(latest_extracted_file)
+        scenario_dir = Path(os.path.dirname(latest_extracted_file))
     else:
-        scenario_dir = f"{model_dir}/{standard_filename}"
-    os.makedirs(scenario_dir, exist_ok=True)
+        scenario_dir = Path(model_dir) / standard_filename
+        _ensure_dir(scenario_dir)
     
     # Calculate scores using the file_info
     # score_results_dict is like: {'mode_name': {scores...}, 'file_info': {info}}
-    score_results_dict = calculate_scores(latest_extracted_file, override_file_info=file_info)
+    score_results_dict = calculate_scores(latest_extracted_file, override_file_info=file_info, workers=args.workers)
 
     # Extract the actual scores for the mode
     mode_key_from_scores = next(k for k in score_results_dict if k != 'file_info')
     mode_scores = score_results_dict[mode_key_from_scores]
 
     # Save results to markdown
-    markdown_report = f"{scenario_dir}/report_existing_{standard_filename}_{timestamp}.md"
-    with open(markdown_report, 'w') as f:
-        f.write(f"# Legal Argument Generation Results (Existing File)\n\n")
-        f.write(f"Model: (Processed Existing File - Model not run by this script)\n")
-        f.write(f"Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        f.write("## Scenario Information\n\n")
-        f.write(f"- Source File: {os.path.basename(latest_extracted_file)}\n")
-        f.write(f"- Mode: {file_info['mode']}\n")
-        f.write(f"- Format: {file_info['format']}\n")
-        f.write(f"- Number: {file_info['number']}\n")
-        f.write(f"- Complexity: {file_info['complexity']}\n\n")
-        
-        f.write("## Score Results\n\n")
-        header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Accuracy (%) | Strength (%) "
-        separator = "|------|--------|--------|------------|------------------|-------------------|--------------|---------------"
-        values_row = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {mode_scores['original_factors']} | {mode_scores['distilled_factors']} | {mode_scores['accuracy']:.2f} | {mode_scores['strength']:.2f} "
-
-        if file_info['mode'].lower() in ['non-arguable', 'unarguable']:
-            header += "| Successful Abstention Ratio (%) "
-            separator += "|---------------------------------"
-            values_row += f"| {mode_scores.get('successful_abstention_ratio', 0):.2f}% "
-        
-        header += "|"
-        separator += "|"
-        values_row += "|"
+    markdown_report = scenario_dir / f"report_existing_{standard_filename}_{timestamp}.md"
+    parts = []
+    parts.append(f"# Legal Argument Generation Results (Existing File)\n\n")
+    parts.append(f"Model: (Processed Existing File - Model not run by this script)\n")
+    parts.append(f"Run Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+    parts.append("## Scenario Information\n\n")
+    parts.append(f"- Source File: {os.path.basename(latest_extracted_file)}\n")
+    parts.append(f"- Mode: {file_info['mode']}\n")
+    parts.append(f"- Format: {file_info['format']}\n")
+    parts.append(f"- Number: {file_info['number']}\n")
+    parts.append(f"- Complexity: {file_info['complexity']}\n\n")
+    
+    parts.append("## Score Results\n\n")
+    header = "| Mode | Format | Number | Complexity | Original Factors | Distilled Factors | Accuracy (%) | Strength (%) "
+    separator = "|------|--------|--------|------------|------------------|-------------------|--------------|---------------"
+    values_row = f"| {file_info['mode']} | {file_info['format']} | {file_info['number']} | {file_info['complexity']} | {mode_scores['original_factors']} | {mode_scores['distilled_factors']} | {mode_scores['accuracy']:.2f} | {mode_scores['strength']:.2f} "
+
+    if file_info['mode'].lower() in _ABSTENTION_MODES:
+        header += "| Successful Abstention Ratio (%) "
+        separator += "|---------------------------------"
+        values_row += f"| {mode_scores.get('successful_abstention_ratio', 0):.2f}% "
+    
+    header += "|"
+    separator += "|"
+    values_row += "|"
 
-        f.write(header + "\n")
-        f.write(separator + "\n")
-        f.write(values_row + "\n\n")
-        f.write(f"Processed existing file: {os.path.basename(latest_extracted_file)}\n")
+    parts.append(header + "\n")
+    parts.append(separator + "\n")
+    parts.append(values_row + "\n\n")
+    parts.append(f"Processed existing file: {os.path.basename(latest_extracted_file)}\n")
+    markdown_report.write_text(''.join(parts))
 
     print(f"\nReport saved to: {markdown_report}")
     return file_info, standard_filename
@@ -558,6 +651,7 @@ def main():
     # Add a new argument for cleaning up intermediate JSON logs
     parser.add_argument("--keep-logs", action="store_true", help="Keep intermediate JSON log files instead of deleting them.")
     parser.add_argument("--output-dir", default="pipeline_results", help="Directory to store all output files")
+    parser.add_argument("--workers", type=int, default=1, help=f"Worker processes for scoring files with at least {_PARALLEL_MIN_ROWS} rows (default: 1)")
     
     args = parser.parse_args()
 
@@ -566,7 +660,7 @@ def main():
     # Create a directory for this model, if it doesn't exist
     model_dir_name = args.model.replace('/', '_') # Sanitize model name for directory
     model_dir = f"{args.output_dir}/{model_dir_name}"
-    os.makedirs(model_dir, exist_ok=True)
+    _ensure_dir(model_dir)
 
     results = {}
     file_info = None
@@ -590,7 +684,7 @@ def main():
             print("ERROR: --input-file is required unless --skip-generation is used.", file=sys.stderr)
             sys.exit(1)
             
-        file_info = extract_info_from_filename(args.input_file)
+        file_info = dict(extract_info_from_filename(args.input_file))
         # Ensure format is 'factor'
         if file_info['format'] != 'factor':
              print(f"Warning: Input file {args.input_file} parsed as format '{file_info['format']}'. Pipeline expects 'factor' format. Overriding to 'factor'.")
@@ -600,7 +694,11 @@ def main():
         
         print(f"\nRunning pipeline for: {standard_filename} with model {args.model}")
 
-        factor_results_package = process_factor_agent_output(model_dir, timestamp, file_info, args, standard_filename) # Renamed for clarity
+        # Create the scenario directory once; helpers write into it directly
+        scenario_dir = Path(model_dir) / standard_filename
+        _ensure_dir(scenario_dir)
+
+        factor_results_package = process_factor_agent_output(scenario_dir, timestamp, file_info, args, standard_filename) # Renamed for clarity
         if factor_results_package:
             # The structure from calculate_scores is {mode_name_key: data_for_that_mode, 'file_info': info}
             # We want results to be {mode_name_key: data_for_that_mode, 'file_info': info} for save_results_to_markdown
@@ -610,7 +708,7 @@ def main():
 
     # Save combined results if any results were generated/processed
     if results and 'file_info' in results: # Check if file_info exists in results
-        save_results_to_markdown(results, model_dir, timestamp, standard_filename, args)
+        save_results_to_markdown(results, scenario_dir, timestamp, standard_filename, args)
     elif file_info : # If only file_info is available (e.g. process_input_file in skip-gen when no other results)
         print("\nNo agent results to save to a combined markdown report, but input file was processed.")
         # Markdown for input file processing is already created within process_input_file
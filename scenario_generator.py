@@ -1,10 +1,127 @@
 import random
-import re
-import json
 import csv
-import string
 import argparse
 import sys
+import logging
+from functools import lru_cache
+
+log = logging.getLogger(__name__)
+
+# Factor names indexed by factor ID; generation works on IDs and only formats these for output
+FACTOR_STRINGS = (
+    "F1 Disclosure-in-negotiations (D)",
+    "F2 Bribe-employee (P)",
+    "F3 Employee-sole-developer (D)",
+    "F4 Agreed-not-to-disclose (P)",
+    "F5 Agreement-not-specific (D)",
+    "F6 Security-measures (P)",
+    "F7 Brought-tools (P)",
+    "F8 Competitive-advantage (P)",
+    "F10 Secrets-disclosed-outsiders (D)",
+    "F11 Vertical-knowledge (D)",
+    "F12 Outsider-disclosures-restricted (P)",
+    "F13 Noncompetition-agreement (P)",
+    "F14 Restricted-materials-used (P)",
+    "F15 Unique-product (P)",
+    "F16 Info-reverse-engineerable (D)",
+    "F17 Info-independently-generated (D)",
+    "F18 Identical-products (P)",
+    "F19 No-security-measures (D)",
+    "F20 Info-known-to-competitors (D)",
+    "F21 Knew-info-confidential (P)",
+    "F22 Invasive-techniques (P)",
+    "F23 Waiver-of-confidentiality (D)",
+    "F24 Info-obtainable-elsewhere (D)",
+    "F25 Info-reverse-engineered (D)",
+    "F26 Deception (P)",
+    "F27 Disclosure-in-public-forum (D)"
+)
+
+# Scenario prompt layout shared by initial and updated prompts; factors are one per line
+_FACTOR_SEPARATOR = ",\n\t"
+_PROMPT_TEMPLATE = """
+Input Scenario 
+\t{input_factors}
+
+TSC 1
+outcome {outcome1}
+\t{tsc1_factors}
+
+TSC 2
+outcome {outcome2}
+\t{tsc2_factors}
+"""
+
+# Polarity per factor ID: 1 = pro-plaintiff (P), 0 = pro-defendant (D)
+FACTOR_POLARITY = tuple(1 if f.endswith("(P)") else 0 for f in FACTOR_STRINGS)
+
+# Factor subsets as bitmasks over factor IDs: bit i is set when factor i is in the subset
+_ALL_MASK = (1 << len(FACTOR_STRINGS)) - 1
+_P_MASK = sum(1 << i for i, p in enumerate(FACTOR_POLARITY) if p)
+_D_MASK = _ALL_MASK & ~_P_MASK
+
+def _mask_of(factor_ids):
+    mask = 0
+    for i in factor_ids:
+        mask |= 1 << i
+    return mask
+
+def _popcount(mask):
+    # int.bit_count() needs Python 3.10; counting the binary digits is as quick for a 26-bit mask
+    return bin(mask).count("1")
+
+def _mask_ids(mask):
+    """Return the factor IDs set in mask, in increasing order."""
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+@lru_cache(maxsize=4096)
+def _polarity_split(mask):
+    """Return the (pro-defendant, pro-plaintiff) factor IDs in mask; inputs repeat often at low complexity."""
+    return tuple(_mask_ids(mask & _D_MASK)), tuple(_mask_ids(mask & _P_MASK))
+
+@lru_cache(maxsize=4096)
+def _format_mask(mask):
+    """Return the prompt block listing the factors in mask, shared across scenarios with equal subsets."""
+    return _FACTOR_SEPARATOR.join([FACTOR_STRINGS[i] for i in _mask_ids(mask)])
+
+# Bounded integers are scaled from one C-level random() call rather than going through
+# random.randrange/randint, whose rejection sampling runs in Python on every draw
+_random = random.random
+
+def _randbelow(n):
+    return int(_random() * n)
+
+def _randint(a, b):
+    return a + int(_random() * (b - a + 1))
+
+def _sample_mask(mask, k, randbelow=_randbelow):
+    """Sample k distinct factor IDs from the bits set in mask, returned sorted.
+
+    Floyd's algorithm draws k positions among the popcount(mask) set bits, which
+    are then mapped back to factor IDs in one pass over the mask's set bits.
+    """
+    m = _popcount(mask)
+    if not 0 <= k <= m:
+        raise ValueError("Sample larger than population or is negative")
+    positions = set()
+    for j in range(m - k, m):
+        t = randbelow(j + 1)
+        positions.add(j if t in positions else t)
+    
+    result = []
+    pos = 0
+    while mask and len(result) < k:
+        low = mask & -mask
+        if pos in positions:
+            result.append(low.bit_length() - 1)
+        mask ^= low
+        pos += 1
+    return result
 
 class ScenarioGenerator():
     # Map new mode names to internal mode names
@@ -17,35 +134,8 @@ class ScenarioGenerator():
     def __init__(self, mode1="reordered", mode2="reordered", complexity=5):
         # Output format is now fixed to "factor"
         output_format = "factor"
-        print(f"Initializing generator with mode1={mode1}, mode2={mode2}, format={output_format}, complexity={complexity}")
-        self.factors = [
-            "F1 Disclosure-in-negotiations (D)", 
-            "F2 Bribe-employee (P)", 
-            "F3 Employee-sole-developer (D)", 
-            "F4 Agreed-not-to-disclose (P)", 
-            "F5 Agreement-not-specific (D)", 
-            "F6 Security-measures (P)", 
-            "F7 Brought-tools (P)", 
-            "F8 Competitive-advantage (P)", 
-            "F10 Secrets-disclosed-outsiders (D)", 
-            "F11 Vertical-knowledge (D)", 
-            "F12 Outsider-disclosures-restricted (P)", 
-            "F13 Noncompetition-agreement (P)", 
-            "F14 Restricted-materials-used (P)", 
-            "F15 Unique-product (P)", 
-            "F16 Info-reverse-engineerable (D)", 
-            "F17 Info-independently-generated (D)", 
-            "F18 Identical-products (P)", 
-            "F19 No-security-measures (D)", 
-            "F20 Info-known-to-competitors (D)", 
-            "F21 Knew-info-confidential (P)", 
-            "F22 Invasive-techniques (P)", 
-            "F23 Waiver-of-confidentiality (D)", 
-            "F24 Info-obtainable-elsewhere (D)", 
-            "F25 Info-reverse-engineered (D)", 
-            "F26 Deception (P)", 
-            "F27 Disclosure-in-public-forum (D)"
-        ]
+        log.debug("Initializing generator with mode1=%s, mode2=%s, format=%s, complexity=%s", mode1, mode2, output_format, complexity)
+        self.factors = range(len(FACTOR_STRINGS))
         
         if mode1 in self.MODE_MAPPING:
             self.mode1 = self.MODE_MAPPING[mode1]
@@ -61,95 +151,89 @@ class ScenarioGenerator():
         else:
             self.mode2 = "reordered"  # Default
             
-        print(f"Internal modes: mode1={self.mode1}, mode2={self.mode2}")
+        log.debug("Internal modes: mode1=%s, mode2=%s", self.mode1, self.mode2)
         self.output_format = output_format # Always factor
         self.complexity = complexity
-        print("Generating initial scenario...")
+        log.debug("Generating initial scenario...")
         self.input_factors, self.tsc1, self.tsc2 = self.generate_input_scenario()
-        print("Initialization complete.")
+        self._input_sorted_str = None
+        log.debug("Initialization complete.")
 
     def generate_input_factor(self):
-        print("Generating input factors...")
-        selected_factors = []
-        used_indices = set()
-        
+        log.debug("Generating input factors...")
         min_factors = max(1, self.complexity - 1)
         max_factors = self.complexity + 1
-        target_count = random.randint(min_factors, max_factors)
-        print(f"Target count for input factors: {target_count}")
+        target_count = _randint(min_factors, max_factors)
+        log.debug("Target count for input factors: %s", target_count)
         
-        while len(selected_factors) < target_count:
-            index = random.randint(0, len(self.factors) - 1)
-            if index not in used_indices:
-                selected_factors.append(self.factors[index])
-                used_indices.add(index)
+        # Draw distinct factors with one Floyd sample instead of rejection-sampling indices.
+        # The IDs are kept so TSC sampling can exclude them without rescanning the list.
+        selected_factors = _sample_mask(_ALL_MASK, target_count)
+        self._input_mask = _mask_of(selected_factors)
         
-        print(f"Generated {len(selected_factors)} input factors")
+        log.debug("Generated %s input factors", len(selected_factors))
         return selected_factors
 
     def generate_tsc_factor(self, input_factors, mode="unarguable", is_tsc1=True):
         tsc_type = "TSC1" if is_tsc1 else "TSC2"
-        print(f"Generating {tsc_type} factors with mode: {mode}...")
+        log.debug("Generating %s factors with mode: %s...", tsc_type, mode)
         selected_factors = []
         used_indices = set()
         
         min_factors = max(1, self.complexity - 1)
         max_factors = self.complexity + 1
-        target_count = random.randint(min_factors, max_factors)
-        print(f"Target count for {tsc_type}: {target_count}")
+        target_count = _randint(min_factors, max_factors)
+        log.debug("Target count for %s: %s", tsc_type, target_count)
         
         if mode == "arguable":
             # Get pro-defendant and pro-plaintiff factors from input
-            input_d_factors = [f for f in input_factors if "(D)" in f]
-            input_p_factors = [f for f in input_factors if "(P)" in f]
+            # Reuse the input mask built when the input was drawn instead of rescanning input_factors
+            input_d_factors, input_p_factors = _polarity_split(self._input_mask)
             
             if is_tsc1:
                 # For TSC1: 1-3 pro-plaintiff factors
                 if input_p_factors:  # Check if there are any P factors
-                    n_common = random.randint(1, min(3, len(input_p_factors)))
+                    n_common = _randint(1, min(3, len(input_p_factors)))
                     common_factors = random.sample(input_p_factors, n_common)
                     selected_factors.extend(common_factors)
-                    used_indices.update(self.factors.index(f) for f in common_factors)
+                    used_indices.update(common_factors)
             else:
                 # For TSC2: 1-3 pro-defendant factors 
                 if input_d_factors:  # Check if there are any D factors
-                    n_common = random.randint(1, min(3, len(input_d_factors)))
+                    n_common = _randint(1, min(3, len(input_d_factors)))
                     common_factors = random.sample(input_d_factors, n_common)
                     selected_factors.extend(common_factors)
-                    used_indices.update(self.factors.index(f) for f in common_factors)
+                    used_indices.update(common_factors)
             
             # Maybe add some other shared factors
-            other_factors = [f for f in input_factors if f not in selected_factors]
+            other_factors = [f for f in input_factors if f not in used_indices]
             if other_factors and random.random() < 0.7: # Increased probability
-                n_other = random.randint(1, min(3, len(other_factors))) # Increased max number
-                selected_factors.extend(random.sample(other_factors, n_other))
+                n_other = _randint(1, min(3, len(other_factors))) # Increased max number
+                shared_factors = random.sample(other_factors, n_other)
+                selected_factors.extend(shared_factors)
+                used_indices.update(shared_factors)
             
-            # Add random factors to reach desired length
-            while len(selected_factors) < target_count:
-                factor = random.choice(self.factors)
-                if factor not in selected_factors:
-                    selected_factors.append(factor)
+            # Add random factors to reach desired length, drawn in one call from the unused factors
+            needed = target_count - len(selected_factors)
+            if needed > 0:
+                remaining_mask = _ALL_MASK & ~_mask_of(used_indices)
+                selected_factors.extend(_sample_mask(remaining_mask, min(needed, _popcount(remaining_mask))))
         else:
             # Default unarguable mode: ensure absolutely no common factors
-            print(f"Using unarguable mode for {tsc_type}")
-            available_factors = [f for f in self.factors if f not in input_factors]
-            print(f"Available unique factors: {len(available_factors)}")
+            log.debug("Using unarguable mode for %s", tsc_type)
+            available_mask = _ALL_MASK & ~self._input_mask
+            available_count = _popcount(available_mask)
+            log.debug("Available unique factors: %s", available_count)
             
             # Verify we have enough unique factors
-            if len(available_factors) < target_count:
+            if available_count < target_count:
                 # Adjust the target count if we don't have enough unique factors
-                print(f"Not enough unique factors. Adjusting target count from {target_count} to {len(available_factors)}")
-                target_count = len(available_factors)
+                log.debug("Not enough unique factors. Adjusting target count from %s to %s", target_count, available_count)
+                target_count = available_count
             
-            # Select random factors from available factors (none from input)
-            try:
-                selected_factors = random.sample(available_factors, target_count)
-                print(f"Selected {len(selected_factors)} factors for {tsc_type}")
-            except ValueError as e:
-                print(f"Error selecting factors: {e}")
-                print(f"Available factors: {len(available_factors)}, Target count: {target_count}")
-                # Fallback selection
-                selected_factors = available_factors[:target_count]
+            # Select random factors from the complement of the input (none from input)
+            selected_factors = _sample_mask(available_mask, target_count)
+            log.debug("Selected %s factors for %s", len(selected_factors), tsc_type)
                     
         return selected_factors
 
@@ -158,97 +242,69 @@ class ScenarioGenerator():
             tsc_factor = self.tsc1
         elif tsc == "tsc2":
             tsc_factor = self.tsc2
-        common_factors = [factor for factor in self.input_factors if factor in tsc_factor]
+        common_factors = _mask_ids(self._input_mask & _mask_of(tsc_factor))
 
         return common_factors
 
     def generate_input_scenario(self):
-        print("Generating complete scenario...")
+        log.debug("Generating complete scenario...")
         input_factors = self.generate_input_factor()
-        print(f"Input factors: {len(input_factors)}")
+        log.debug("Input factors: %s", len(input_factors))
         
         # For reordered mode, we'll generate both TSCs using arguable mode first, then swap
         if self.mode1 == "reordered" and self.mode2 == "reordered":
-            print("Using reordered mode: generating with arguable mode then swapping outcomes")
-            print("Generating TSC1 with arguable mode")
+            log.debug("Using reordered mode: generating with arguable mode then swapping outcomes")
+            log.debug("Generating TSC1 with arguable mode")
             tsc1 = self.generate_tsc_factor(input_factors, mode="arguable", is_tsc1=True)
             
-            print("Generating TSC2 with arguable mode")
+            log.debug("Generating TSC2 with arguable mode")
             tsc2 = self.generate_tsc_factor(input_factors, mode="arguable", is_tsc1=False)
             
             # Swap TSC1 and TSC2 to implement reordered mode
-            print("Swapping TSC1 and TSC2 for reordered mode")
+            log.debug("Swapping TSC1 and TSC2 for reordered mode")
             tsc1, tsc2 = tsc2, tsc1
         else:
             # Standard generation for other modes
-            print(f"Generating TSC1 with mode: {self.mode1}")
+            log.debug("Generating TSC1 with mode: %s", self.mode1)
             tsc1 = self.generate_tsc_factor(input_factors, mode=self.mode1, is_tsc1=True)
             
-            print(f"Generating TSC2 with mode: {self.mode2}")
+            log.debug("Generating TSC2 with mode: %s", self.mode2)
             tsc2 = self.generate_tsc_factor(input_factors, mode=self.mode2, is_tsc1=False)
         
-        # For unarguable mode, double-check that there are no overlaps
-        if self.mode1 == "unarguable":
-            common_factors = [f for f in input_factors if f in tsc1]
-            if common_factors:
-                print(f"Found overlapping factors in TSC1: {len(common_factors)}. Regenerating.")
-                tsc1 = self.generate_tsc_factor(input_factors, mode=self.mode1, is_tsc1=True)
-            else:
-                print("No overlaps found in TSC1.")
-                
-        if self.mode2 == "unarguable":
-            common_factors = [f for f in input_factors if f in tsc2]
-            if common_factors:
-                print(f"Found overlapping factors in TSC2: {len(common_factors)}. Regenerating.")
-                tsc2 = self.generate_tsc_factor(input_factors, mode=self.mode2, is_tsc1=False)
-            else:
-                print("No overlaps found in TSC2.")
+        # Unarguable TSCs are sampled from the input's complement, so they are disjoint by construction
+        if __debug__:
+            if self.mode1 == "unarguable":
+                assert not self._input_mask & _mask_of(tsc1), "unarguable TSC1 shares factors with the input"
+            if self.mode2 == "unarguable":
+                assert not self._input_mask & _mask_of(tsc2), "unarguable TSC2 shares factors with the input"
         
         return input_factors, tsc1, tsc2
 
-    def extract_factor_number(self, factor):
-        match = re.match(r"F(\d+)", factor)
-        return int(match.group(1)) if match else float('inf')
+    def _format_factors(self, factor_ids):
+        # Factor IDs follow F-number order, so the mask's bit order is the display order
+        return _format_mask(_mask_of(factor_ids))
 
-    def generate_initial_prompt(self):
-        print("Generating prompt...")
-        # Output format is always "factor"
-        input_scenario_items = sorted(self.input_factors, key=lambda x: int(re.search(r'\\d+', x).group()))
-        tsc1_factors_items = sorted(self.tsc1, key=lambda x: int(re.search(r'\\d+', x).group()))
-        tsc2_factors_items = sorted(self.tsc2, key=lambda x: int(re.search(r'\\d+', x).group()))
-        
-        input_scenario_str = ",\\n\t".join(input_scenario_items)
-        tsc1_factors_str = ",\\n\t".join(tsc1_factors_items)
-        tsc2_factors_str = ",\\n\t".join(tsc2_factors_items)
+    def _get_input_str(self):
+        # The input scenario only changes on restart, so its formatted block is cached
+        if self._input_sorted_str is None:
+            self._input_sorted_str = self._format_factors(self.input_factors)
+        return self._input_sorted_str
 
+    def _render_prompt(self, reordered):
         # For reordered mode, we swap the outcomes
-        if self.mode1 == "reordered" and self.mode2 == "reordered":
-            input_scenario_prompt = f"""
-Input Scenario 
-\t{input_scenario_str}
-
-TSC 1
-outcome Defendant
-\t{tsc1_factors_str}
-
-TSC 2
-outcome Plaintiff
-\t{tsc2_factors_str}
-"""
-        else:
-            input_scenario_prompt = f"""
-Input Scenario 
-\t{input_scenario_str}
-
-TSC 1
-outcome Plaintiff
-\t{tsc1_factors_str}
+        outcome1, outcome2 = ("Defendant", "Plaintiff") if reordered else ("Plaintiff", "Defendant")
+        return _PROMPT_TEMPLATE.format(
+            input_factors=self._get_input_str(),
+            outcome1=outcome1,
+            tsc1_factors=self._format_factors(self.tsc1),
+            outcome2=outcome2,
+            tsc2_factors=self._format_factors(self.tsc2),
+        )
 
-TSC 2
-outcome Defendant
-\t{tsc2_factors_str}
-"""
-        return input_scenario_prompt
+    def generate_initial_prompt(self):
+        log.debug("Generating prompt...")
+        # Output format is always "factor"
+        return self._render_prompt(self.mode1 == "reordered" and self.mode2 == "reordered")
 
     def update_tsc(self, tsc_name, mode="citable"):
         # Handle mode mapping if needed
@@ -259,90 +315,59 @@ outcome Defendant
         else:
             internal_mode = "reordered"  # Default
             
-        print(f"Updating {tsc_name} with mode {internal_mode}")
+        log.debug("Updating %s with mode %s", tsc_name, internal_mode)
         
         if internal_mode == "reordered":
             # For reordered mode, generate both TSCs with arguable mode then swap
-            print("Using reordered mode: generating with arguable mode then swapping outcomes")
+            log.debug("Using reordered mode: generating with arguable mode then swapping outcomes")
             self.tsc1 = self.generate_tsc_factor(self.input_factors, mode="arguable", is_tsc1=True)
             self.tsc2 = self.generate_tsc_factor(self.input_factors, mode="arguable", is_tsc1=False)
             # Swap TSC1 and TSC2 to implement reordered mode
-            print("Swapping TSC1 and TSC2 for reordered mode")
+            log.debug("Swapping TSC1 and TSC2 for reordered mode")
             self.tsc1, self.tsc2 = self.tsc2, self.tsc1
         else:
             # Standard generation for other modes
             if tsc_name == "tsc1":
                 self.tsc1 = self.generate_tsc_factor(self.input_factors, mode=internal_mode, is_tsc1=True)
-                # For unarguable mode, ensure no overlaps
-                if internal_mode == "unarguable":
-                    attempts = 0
-                    while any(factor in self.input_factors for factor in self.tsc1) and attempts < 5:
-                        print(f"Found overlapping factors in TSC1 update. Regenerating (attempt {attempts+1}).")
-                        self.tsc1 = self.generate_tsc_factor(self.input_factors, mode=internal_mode, is_tsc1=True)
-                        attempts += 1
-                    if attempts >= 5:
-                        print("Warning: Could not eliminate overlaps after 5 attempts.")
+                if __debug__ and internal_mode == "unarguable":
+                    assert not self._input_mask & _mask_of(self.tsc1), "unarguable TSC1 shares factors with the input"
             elif tsc_name == "tsc2":
                 self.tsc2 = self.generate_tsc_factor(self.input_factors, mode=internal_mode, is_tsc1=False)
-                # For unarguable mode, ensure no overlaps
-                if internal_mode == "unarguable":
-                    attempts = 0
-                    while any(factor in self.input_factors for factor in self.tsc2) and attempts < 5:
-                        print(f"Found overlapping factors in TSC2 update. Regenerating (attempt {attempts+1}).")
-                        self.tsc2 = self.generate_tsc_factor(self.input_factors, mode=internal_mode, is_tsc1=False)
-                        attempts += 1
-                    if attempts >= 5:
-                        print("Warning: Could not eliminate overlaps after 5 attempts.")
+                if __debug__ and internal_mode == "unarguable":
+                    assert not self._input_mask & _mask_of(self.tsc2), "unarguable TSC2 shares factors with the input"
             else:
                 raise ValueError("Invalid TSC name. Use 'tsc1' or 'tsc2'.")
 
         # Output format is always "factor"
-        input_scenario_items = sorted(self.input_factors, key=self.extract_factor_number)
-        tsc1_factors_items = sorted(self.tsc1, key=self.extract_factor_number)
-        tsc2_factors_items = sorted(self.tsc2, key=self.extract_factor_number)
-        
-        input_scenario_str = ",\\n\t".join(input_scenario_items)
-        tsc1_factors_str = ",\\n\t".join(tsc1_factors_items)
-        tsc2_factors_str = ",\\n\t".join(tsc2_factors_items)
+        return self._render_prompt(internal_mode == "reordered")
 
-        # For reordered mode, we swap the outcomes
-        if internal_mode == "reordered":
-            input_scenario_prompt = f"""
-Input Scenario 
-\t{input_scenario_str}
-
-TSC 1
-outcome Defendant
-\t{tsc1_factors_str}
+    def restart(self):
+        log.debug("Restarting scenario generation...")
+        self.input_factors, self.tsc1, self.tsc2 = self.generate_input_scenario()
+        self._input_sorted_str = None
+        log.debug("Restart complete.")
 
-TSC 2
-outcome Plaintiff
-\t{tsc2_factors_str}
-"""
+def _iter_scenario_prompts(internal_mode, complexity, case_number):
+    """Yield case_number scenario prompts from one generator, restarted for every case after the first."""
+    gen = None
+    for i in range(case_number):
+        log.debug("Generating scenario %s/%s", i+1, case_number)
+        if gen is None:
+            gen = ScenarioGenerator(mode1=internal_mode, mode2=internal_mode, complexity=complexity)
         else:
-            input_scenario_prompt = f"""
-Input Scenario 
-\t{input_scenario_str}
-
-TSC 1
-outcome Plaintiff
-\t{tsc1_factors_str}
-
-TSC 2
-outcome Defendant
-\t{tsc2_factors_str}
-"""
-        return input_scenario_prompt
+            gen.restart()
+        # Unarguable scenarios are disjoint by construction and asserted in generate_input_scenario
+        yield gen.generate_initial_prompt()
 
-    def restart(self):
-        print("Restarting scenario generation...")
-        self.input_factors, self.tsc1, self.tsc2 = self.generate_input_scenario()
-        print("Restart complete.")
+def generate_datasets(mode="non-arguable", case_number=10, complexity=5, return_prompts=False):
+    """Write case_number scenarios to a CSV file, one row per scenario as it is generated.
 
-def generate_datasets(mode="non-arguable", case_number=10, complexity=5):
+    Returns the CSV filename, or the list of generated prompts when return_prompts is set;
+    collecting them keeps every prompt in memory, so it is off by default.
+    """
     # Output format is now fixed to "factor"
     output_format="factor"
-    print(f"Generating {case_number} scenarios with mode={mode}, format={output_format}, complexity={complexity}")
+    log.info("Generating %s scenarios with mode=%s, format=%s, complexity=%s", case_number, mode, output_format, complexity)
     
     # Do mode mapping directly
     if mode in ScenarioGenerator.MODE_MAPPING:
@@ -352,56 +377,31 @@ def generate_datasets(mode="non-arguable", case_number=10, complexity=5):
     else:
         internal_mode = "unarguable"  # Default to unarguable if invalid
         
-    print(f"Internal mode: {internal_mode}")
+    log.info("Internal mode: %s", internal_mode)
     
-    # Generate the specified number of sets
-    scenario_sets = []
-    for i in range(case_number):
-        print(f"Generating scenario {i+1}/{case_number}")
-        gen = ScenarioGenerator(mode1=internal_mode, mode2=internal_mode, complexity=complexity)
-        
-        # Verify that in unarguable mode there are no overlapping factors
-        if internal_mode == "unarguable":
-            max_attempts = 5
-            attempt = 0
-            while attempt < max_attempts:
-                common_tsc1 = [f for f in gen.input_factors if f in gen.tsc1]
-                common_tsc2 = [f for f in gen.input_factors if f in gen.tsc2]
-                
-                if common_tsc1 or common_tsc2:
-                    print(f"Found overlaps after generation. TSC1: {len(common_tsc1)}, TSC2: {len(common_tsc2)}. Restarting ({attempt+1}/{max_attempts}).")
-                    gen.restart()
-                    attempt += 1
-                else:
-                    print("No overlaps found. Scenario is valid.")
-                    break
-                    
-            if attempt >= max_attempts:
-                print(f"Warning: Could not eliminate all overlaps after {max_attempts} attempts.")
-        
-        prompt = gen.generate_initial_prompt()
-        print(f"Generated prompt for scenario {i+1}")
-        scenario_sets.append(prompt)
-
-    # Save to CSV
-    filename_prefix = f"{internal_mode}_{output_format}_{case_number}_complexity{complexity}"
-    print(f"Saving to {filename_prefix}.csv")
+    filename = f"{internal_mode}_{output_format}_{case_number}_complexity{complexity}.csv"
+    log.info("Saving to %s", filename)
     
-    # Save with selected output format (always factor)
+    scenario_sets = [] if return_prompts else None
+    
+    # Rows are written as each scenario is produced, so prompts are only held when requested
     try:
-        with open(f'{filename_prefix}.csv', 'w', newline='') as f:
+        with open(filename, 'w', newline='') as f:
             writer = csv.writer(f)
             writer.writerow(['Scenario'])
-            for scenario in scenario_sets:
-                writer.writerow([scenario])
-        print(f"Successfully saved to {filename_prefix}.csv")
-    except Exception as e:
-        print(f"Error saving to CSV: {e}")
+            for prompt in _iter_scenario_prompts(internal_mode, complexity, case_number):
+                writer.writerow([prompt])
+                if return_prompts:
+                    scenario_sets.append(prompt)
+        log.info("Successfully saved to %s", filename)
+    except OSError as e:
+        log.error("Error saving to CSV: %s", e)
             
-    return scenario_sets
+    return scenario_sets if return_prompts else filename
 
 if __name__ == "__main__":
-    print(f"Starting scenario generator. Python version: {sys.version}")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    log.info("Starting scenario generator. Python version: %s", sys.version)
     parser = argparse.ArgumentParser(description='Generate legal scenario datasets with different modes.')
     parser.add_argument('--mode', choices=['non-arguable', 'reordered', 'arguable'], default='reordered',
                         help='Mode for scenario generation (default: reordered)')
@@ -412,18 +412,16 @@ if __name__ == "__main__":
     
     args = parser.parse_args()
     # output_format is now fixed to factor
-    print(f"Arguments: mode={args.mode}, output_format=factor, case_number={args.case_number}, complexity={args.complexity}")
+    log.info("Arguments: mode=%s, output_format=factor, case_number=%s, complexity=%s", args.mode, args.case_number, args.complexity)
     
     try:
-        datasets = generate_datasets(
+        generate_datasets(
             mode=args.mode,
             case_number=args.case_number,
             complexity=args.complexity
         )
         
-        print(f"Generated {args.case_number} scenarios in '{args.mode}' mode with complexity {args.complexity}.")
-        print(f"Output format: factor")
+        log.info("Generated %s scenarios in '%s' mode with complexity %s.", args.case_number, args.mode, args.complexity)
+        log.info("Output format: factor")
     except Exception as e:
-        print(f"Error during execution: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        log.exception("Error during execution: %s", e)
\ No newline at end of file
@@ -1,9 +1,27 @@
 import os
-import pandas as pd
 import re
+import csv
+from array import array
+from collections.abc import Iterator
 import numpy as np
 from scipy import stats
 
+# Scenario cell lines, classified in one scan of the whole cell; compiled once at import.
+# Alternatives are tried in the same order as the per-line header checks: a line naming a
+# section header switches section, any other line containing a factor is a factor line
+_SCENARIO_LINE_RE = re.compile(r"""^(?:
+    (?P<input>[^\n]*Input[^\S\n]+Scenario)
+  | (?P<tsc1>[^\n]*TSC[^\S\n]+1)
+  | (?P<tsc2>[^\n]*TSC[^\S\n]+2)
+  | [^\S\n]*(?P<factor>[^\n]*F\d+[^\S\n]+[^(\n]+\([PD]\)[^\n]*)
+)""", re.MULTILINE | re.VERBOSE)
+
+# Section keys of the distiller's output
+_DISTILLED_SECTIONS = ("Input Case", "TSC1", "TSC2")
+# Per-section scanners for the distiller output; compiled once at import
+_DISTILLED_SECTION_RES = tuple((key, re.compile(r'"%s"\s*:\s*{(.*?)}' % key, re.DOTALL)) for key in _DISTILLED_SECTIONS)
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+
 def extract_case_factors(input_text: str) -> tuple[list[str], list[str], list[str]]:
     """Extract factors from Input Scenario and both TSC cases.
     
@@ -17,35 +35,17 @@ def extract_case_factors(input_text: str) -> tuple[list[str], list[str], list[st
     input_factors = []
     tsc1_factors = []
     tsc2_factors = []
-    
-    # Define regex patterns
-    input_pattern = re.compile(r'Input\s+Scenario')
-    tsc1_pattern = re.compile(r'TSC\s+1')
-    tsc2_pattern = re.compile(r'TSC\s+2')
-    factor_pattern = re.compile(r'F\d+\s+[^(]+\([PD]\)')
+    sections = {'input': input_factors, 'tsc1': tsc1_factors, 'tsc2': tsc2_factors}
     
     current_section = None
     
-    # Process each line
-    for line in input_text.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
-            
-        if re.search(input_pattern, line):
-            current_section = 'input'
-        elif re.search(tsc1_pattern, line):
-            current_section = 'tsc1'
-        elif re.search(tsc2_pattern, line):
-            current_section = 'tsc2'
-        elif re.search(factor_pattern, line):
-            factor = line.strip().rstrip(',')
-            if current_section == 'input':
-                input_factors.append(factor)
-            elif current_section == 'tsc1':
-                tsc1_factors.append(factor)
-            elif current_section == 'tsc2':
-                tsc2_factors.append(factor)
+    # Process each header or factor line, switching section as headers appear
+    for match in _SCENARIO_LINE_RE.finditer(input_text):
+        kind = match.lastgroup
+        if kind != 'factor':
+            current_section = sections[kind]
+        elif current_section is not None:
+            current_section.append(match.group('factor').rstrip().rstrip(','))
                 
     return input_factors, tsc1_factors, tsc2_factors
 
@@ -66,62 +66,97 @@ def process_csv_row(row_text: str) -> dict[str, list[str]]:
         'TSC2': tsc2_factors
     }
 
-def process_distilled_factors(row_text: str) -> dict:
+def process_distilled_factors(row_text: str) -> dict[str, frozenset[str]]:
     """Process distilled factors text and return structured factor data.
     
     Args:
         row_text: Raw text from CSV cell containing distilled factors in JSON-like format
         
     Returns:
-        Dictionary containing the structured factor data matching the input format
+        Dictionary mapping "Input Case", "TSC1" and "TSC2" to frozensets of factor names
     """
     # First, remove content before "</think>" and "</think>" itself
-    think_end = row_text.find("</think>")
-    if think_end != -1:
-        row_text = row_text[think_end + len("</think>"):].strip()
+    _, think_tag, answer = row_text.partition("</think>")
+    if think_tag:
+        row_text = answer.strip()
     
     # Extract the JSON-like content by removing any leading/trailing text
-    json_content = re.search(r'\{.*\}', row_text, re.DOTALL)
-    if not json_content:
+    start = row_text.find('{')
+    end = row_text.rfind('}')
+    if start == -1 or end < start:
         return {
-            "Input Case": {},
-            "TSC1": {},
-            "TSC2": {}
+            "Input Case": frozenset(),
+            "TSC1": frozenset(),
+            "TSC2": frozenset()
         }
         
     # Extract the JSON text
-    json_text = json_content.group(0)
+    json_text = row_text[start:end + 1]
     
     # Use regex to extract the case factors
-    input_case_match = re.search(r'"Input Case"\s*:\s*{(.*?)}', json_text, re.DOTALL)
-    tsc1_match = re.search(r'"TSC1"\s*:\s*{(.*?)}', json_text, re.DOTALL)
-    tsc2_match = re.search(r'"TSC2"\s*:\s*{(.*?)}', json_text, re.DOTALL)
-    
     result = {
-        "Input Case": {},
-        "TSC1": {},
-        "TSC2": {}
+        "Input Case": frozenset(),
+        "TSC1": frozenset(),
+        "TSC2": frozenset()
     }
+    for key, section_re in _DISTILLED_SECTION_RES:
+        section_match = section_re.search(json_text)
+        if section_match:
+            factors = _QUOTED_RE.findall(section_match.group(1))
+            result[key] = frozenset(factors)
+    
+    return result
+
+def count_factor_diffs(input_factors: dict[str, list[str]], 
+                       distilled_factors: dict) -> tuple[tuple[int, int, int], tuple[int, int, int], tuple[int, int]]:
+    """Count factor mismatches and weaknesses in a single pass over both cases.
     
-    # Process Input Case factors
-    if input_case_match:
-        factors_text = input_case_match.group(1)
-        factors = re.findall(r'"([^"]+)"', factors_text)
-        result["Input Case"] = {factor: None for factor in factors}
+    Args:
+        input_factors: Dictionary containing factors from input text
+        distilled_factors: Dictionary containing the structured factor data
+        
+    Returns:
+        Tuple of ((input_mismatch, tsc1_mismatch, tsc2_mismatch),
+                  (input_weakness, tsc1_weakness, tsc2_weakness),
+                  (original_total_factor_count, distilled_total_factor_count))
+    """
+    # Look each section up once
+    input_list = input_factors['Input']
+    tsc1_list = input_factors['TSC1']
+    tsc2_list = input_factors['TSC2']
+    distilled_input = distilled_factors["Input Case"]
+    distilled_tsc1 = distilled_factors["TSC1"]
+    distilled_tsc2 = distilled_factors["TSC2"]
     
-    # Process TSC1 factors
-    if tsc1_match:
-        factors_text = tsc1_match.group(1)
-        factors = re.findall(r'"([^"]+)"', factors_text)
-        result["TSC1"] = {factor: None for factor in factors}
+    # Calculate total factors in original input
+    original_total_factors = len(input_list) + len(tsc1_list) + len(tsc2_list)
     
-    # Process TSC2 factors
-    if tsc2_match:
-        factors_text = tsc2_match.group(1)
-        factors = re.findall(r'"([^"]+)"', factors_text)
-        result["TSC2"] = {factor: None for factor in factors}
+    # An abstention claims nothing: no mismatches, and every actual factor is a weakness
+    if not (distilled_input or distilled_tsc1 or distilled_tsc2):
+        weaknesses = (len(set(input_list)), len(set(tsc1_list)), len(set(tsc2_list)))
+        return (0, 0, 0), weaknesses, (original_total_factors, 0)
     
-    return result
+    # Build each side's set once so membership tests are hash lookups, not list scans
+    actual_input = set(input_list)
+    actual_tsc1 = set(tsc1_list)
+    actual_tsc2 = set(tsc2_list)
+    # Distilled sections are already frozensets, which frozenset() returns without copying
+    distilled_input_factors = frozenset(distilled_input)
+    distilled_tsc1_factors = frozenset(distilled_tsc1)
+    distilled_tsc2_factors = frozenset(distilled_tsc2)
+    
+    # Calculate total factors in distilled input
+    distilled_total_factors = len(distilled_input_factors) + len(distilled_tsc1_factors) + len(distilled_tsc2_factors)
+    
+    # Mismatches are claimed but absent from the actual case; weaknesses are present but not claimed
+    mismatches = (len(distilled_input_factors - actual_input),
+                  len(distilled_tsc1_factors - actual_tsc1),
+                  len(distilled_tsc2_factors - actual_tsc2))
+    weaknesses = (len(actual_input - distilled_input_factors),
+                  len(actual_tsc1 - distilled_tsc1_factors),
+                  len(actual_tsc2 - distilled_tsc2_factors))
+    
+    return mismatches, weaknesses, (original_total_factors, distilled_total_factors)
 
 def count_factor_mismatches(input_factors: dict[str, list[str]], 
                           distilled_factors: dict) -> tuple[int, int, int, int, int]:
@@ -135,35 +170,8 @@ def count_factor_mismatches(input_factors: dict[str, list[str]],
         Tuple of (input_mismatch_count, tsc1_mismatch_count, tsc2_mismatch_count, 
                  original_total_factor_count, distilled_total_factor_count)
     """
-    input_mismatch = 0
-    tsc1_mismatch = 0
-    tsc2_mismatch = 0
-    
-    # Extract factor names from the distilled factors
-    distilled_input_factors = list(distilled_factors["Input Case"].keys())
-    distilled_tsc1_factors = list(distilled_factors["TSC1"].keys())
-    distilled_tsc2_factors = list(distilled_factors["TSC2"].keys())
-    
-    # Calculate total factors in original and distilled input
-    original_total_factors = len(input_factors['Input']) + len(input_factors['TSC1']) + len(input_factors['TSC2'])
-    distilled_total_factors = len(distilled_input_factors) + len(distilled_tsc1_factors) + len(distilled_tsc2_factors)
-    
-    # Check for factors claimed in distilled Input but not in actual Input
-    for factor in distilled_input_factors:
-        if factor not in input_factors['Input']:
-            input_mismatch += 1
-    
-    # Check for factors claimed in distilled TSC1 but not in actual TSC1
-    for factor in distilled_tsc1_factors:
-        if factor not in input_factors['TSC1']:
-            tsc1_mismatch += 1
-    
-    # Check for factors claimed in distilled TSC2 but not in actual TSC2
-    for factor in distilled_tsc2_factors:
-        if factor not in input_factors['TSC2']:
-            tsc2_mismatch += 1
-            
-    return input_mismatch, tsc1_mismatch, tsc2_mismatch, original_total_factors, distilled_total_factors
+    mismatches, _, totals = count_factor_diffs(input_factors, distilled_factors)
+    return mismatches + totals
 
 def count_factor_weaknesses(input_factors: dict[str, list[str]], 
                           distilled_factors: dict) -> tuple[int, int, int, int, int]:
@@ -177,47 +185,28 @@ def count_factor_weaknesses(input_factors: dict[str, list[str]],
         Tuple of (input_weakness_count, tsc1_weakness_count, tsc2_weakness_count,
                  original_total_factor_count, distilled_total_factor_count)
     """
-    input_weakness = 0
-    tsc1_weakness = 0
-    tsc2_weakness = 0
-    
-    # Extract factor names from the distilled factors
-    distilled_input_factors = list(distilled_factors["Input Case"].keys())
-    distilled_tsc1_factors = list(distilled_factors["TSC1"].keys())
-    distilled_tsc2_factors = list(distilled_factors["TSC2"].keys())
-    
-    # Calculate total factors in original and distilled input
-    original_total_factors = len(input_factors['Input']) + len(input_factors['TSC1']) + len(input_factors['TSC2'])
-    distilled_total_factors = len(distilled_input_factors) + len(distilled_tsc1_factors) + len(distilled_tsc2_factors)
-    
-    # Check for factors in actual Input but not claimed in distilled Input
-    for factor in input_factors['Input']:
-        if factor not in distilled_input_factors:
-            input_weakness += 1
+    _, weaknesses, totals = count_factor_diffs(input_factors, distilled_factors)
+    return weaknesses + totals
 
-    # Check for factors in actual TSC1 but not claimed in distilled TSC1
-    for factor in input_factors['TSC1']:
-        if factor not in distilled_tsc1_factors:
-            tsc1_weakness += 1
-    
-    # Check for factors in actual TSC2 but not claimed in distilled TSC2
-    for factor in input_factors['TSC2']:
-        if factor not in distilled_tsc2_factors:
-            tsc2_weakness += 1
-            
-    return input_weakness, tsc1_weakness, tsc2_weakness, original_total_factors, distilled_total_factors
+def _iter_scored_columns(file) -> Iterator[tuple[str, str]]:
+    """Yield (scenario, distilled factors) from the first and third columns of a results CSV."""
+    csv_reader = csv.reader(file)
+    next(csv_reader, None)  # Skip header row
+    for row in csv_reader:
+        if row:  # Skip empty rows
+            yield row[0], row[2] if len(row) > 2 else ''
 
 def process_csv_file(file_path: str) -> None:
     """Process a single CSV file and print its statistics."""
     print(f"\nProcessing file: {file_path}")
     print("=" * 50)
     
-    df = pd.read_csv(file_path)
-    total_rows = len(df)
+    total_rows = 0
     
-    # Lists to store accuracy values and total factors
-    all_accuracies = []
-    all_strengths = []
+    # Per-row accuracy and strength percentages, stored compactly as float32 since the row
+    # count is not known while streaming; totals are plain integer counters
+    all_accuracies = array('f')
+    all_strengths = array('f')
     all_factors = 0
     all_mismatches = 0
     all_weaknesses = 0
@@ -225,45 +214,47 @@ def process_csv_file(file_path: str) -> None:
     all_distilled_factors = 0
     successful_abstention_count = 0
     
-    # Process each row
-    for index, row in df.iterrows():
-        # Process the input factors from the first column
-        input_factors = process_csv_row(row.iloc[0])
+    # Only the scenario (first) and distilled factors (third) columns are scored, so stream
+    # the rows with csv.reader instead of building a DataFrame and a Series per row
+    with open(file_path, newline='', encoding='utf-8') as file:
+        for scenario, distilled in _iter_scored_columns(file):
+            total_rows += 1
         
-        # Process the distilled factors from the third column using the new format
-        distilled_factors = process_distilled_factors(row.iloc[2])
+            # Process the input factors from the first column
+            input_factors = process_csv_row(scenario)
         
-        # Calculate mismatches
-        input_mismatch, tsc1_mismatch, tsc2_mismatch, orig_factors, dist_factors = count_factor_mismatches(input_factors, distilled_factors)
-        total_mismatches = input_mismatch + tsc1_mismatch + tsc2_mismatch
+            # Process the distilled factors from the third column using the new format
+            distilled_factors = process_distilled_factors(distilled)
         
-        # Calculate weaknesses
-        input_weakness, tsc1_weakness, tsc2_weakness, _, _ = count_factor_weaknesses(input_factors, distilled_factors)
-        total_weaknesses = input_weakness + tsc1_weakness + tsc2_weakness
+            # Check if all categories in distilled_factors are empty
+            if not (distilled_factors["Input Case"] or distilled_factors["TSC1"] or distilled_factors["TSC2"]):
+                successful_abstention_count += 1
         
-        total_factors = sum(len(factors) for factors in input_factors.values())
+            # Calculate mismatches and weaknesses together; abstentions take count_factor_diffs' fast path
+            mismatches, weaknesses, (orig_factors, dist_factors) = count_factor_diffs(input_factors, distilled_factors)
+            input_mismatch, tsc1_mismatch, tsc2_mismatch = mismatches
+            input_weakness, tsc1_weakness, tsc2_weakness = weaknesses
+            total_mismatches = input_mismatch + tsc1_mismatch + tsc2_mismatch
+            total_weaknesses = input_weakness + tsc1_weakness + tsc2_weakness
         
-        # Check if all categories in distilled_factors are empty
-        if not distilled_factors.get("Input Case") and \
-           not distilled_factors.get("TSC1") and \
-           not distilled_factors.get("TSC2"):
-            successful_abstention_count += 1
+            # The original total already counts every factor across the three cases
+            total_factors = orig_factors
             
-        # Calculate accuracy and strength for the current row FIRST
-        accuracy = 1 - total_mismatches / orig_factors if orig_factors > 0 else 0
-        strength = 1 - total_weaknesses / orig_factors if orig_factors > 0 else 0
+            # Calculate accuracy and strength for the current row FIRST
+            accuracy = 1 - total_mismatches / orig_factors if orig_factors > 0 else 0
+            strength = 1 - total_weaknesses / orig_factors if orig_factors > 0 else 0
         
-        all_accuracies.append(accuracy * 100)
-        all_strengths.append(strength * 100)
-        all_factors += total_factors
-        all_mismatches += total_mismatches
-        all_weaknesses += total_weaknesses
-        all_original_factors += orig_factors
-        all_distilled_factors += dist_factors
+            all_accuracies.append(accuracy * 100)
+            all_strengths.append(strength * 100)
+            all_factors += total_factors
+            all_mismatches += total_mismatches
+            all_weaknesses += total_weaknesses
+            all_original_factors += orig_factors
+            all_distilled_factors += dist_factors
         
     # Calculate and print overall results
-    mean_acc = np.mean(all_accuracies) if all_accuracies else 0
-    mean_strength = np.mean(all_strengths) if all_strengths else 0
+    mean_acc = float(np.frombuffer(all_accuracies, dtype=np.float32).mean(dtype=np.float64)) if all_accuracies else 0
+    mean_strength = float(np.frombuffer(all_strengths, dtype=np.float32).mean(dtype=np.float64)) if all_strengths else 0
     successful_abstention_ratio = successful_abstention_count / total_rows if total_rows > 0 else 0
     
     print(f"\nOverall statistics:")
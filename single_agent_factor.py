@@ -4,14 +4,30 @@ import csv
 import datetime
 import time
 import argparse
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import re
+import shelve
+import hashlib
 from dotenv import load_dotenv
 from openai import OpenAI
 from groq import Groq
 
+try:
+    import orjson  # Optional: faster serialization of response log records
+except ImportError:
+    orjson = None
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Minimum seconds between scenario starts, shared by all worker threads
+_MIN_SCENARIO_INTERVAL = 1.0
+
+# Fenced ```json snippets in an argument response
+_JSON_BLOCK_RE = re.compile(r'```json(.*?)```', re.DOTALL)
+
 def get_openai_client():
     """
     Get OpenAI client with API key from environment
@@ -158,6 +174,7 @@ Example Output:
 
 def process_with_openai(client, model, prompt, system_prompt, temperature=0.1, max_tokens=2000):
     """Process a prompt using the OpenAI API"""
+    # The system prompt leads every request for a task, so OpenAI's automatic prompt caching can reuse it as a prefix
     response = client.chat.completions.create(
         model=model,
         messages=[
@@ -191,13 +208,68 @@ def process_with_groq(client, model, prompt, system_prompt, temperature=0.1, max
     )
     return response.choices[0].message.content
 
+class ResponseCache:
+    """Persistent cache of LLM responses, keyed on the model, system prompt, prompt and sampling settings.
+
+    Responses are sampled, so a hit replays an earlier sample instead of drawing a new one;
+    the cache is therefore only used when a cache file is requested explicitly.
+    """
+    
+    def __init__(self, path):
+        self._db = shelve.open(path)
+        self._lock = threading.Lock()
+        self._system_prompt_hashes = {}
+        atexit.register(self.close)
+    
+    def _key(self, model, prompt, system_prompt, params):
+        # System prompts are multi-KB and shared by every call, so each is hashed only once
+        system_hash = self._system_prompt_hashes.get(system_prompt)
+        if system_hash is None:
+            system_hash = hashlib.blake2b(system_prompt.encode(), digest_size=16).hexdigest()
+            self._system_prompt_hashes[system_prompt] = system_hash
+        payload = json.dumps([model, system_hash, prompt, sorted(params.items())])
+        return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+    
+    def fetch(self, call, client, model, prompt, system_prompt, **params):
+        """Return the cached response for this request, calling call(...) and storing its result on a miss"""
+        key = self._key(model, prompt, system_prompt, params)
+        with self._lock:
+            response = self._db.get(key)
+        if response is None:
+            response = call(client, model, prompt, system_prompt, **params)
+            with self._lock:
+                self._db[key] = response
+        return response
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+def extract_last_json_block(response):
+    """Return the last ```json fenced snippet in response, or the whole response if there is none"""
+    # The last snippet is usually the final, closed fence, which plain string search finds directly
+    start = response.rfind('```json')
+    if start != -1:
+        end = response.find('```', start + 7)
+        if end != -1:
+            return response[start + 7:end].strip()
+    
+    matches = _JSON_BLOCK_RE.findall(response)
+    if matches:
+        # Get the last match (last JSON snippet)
+        return matches[-1].strip()
+    return response
+
 def setup_logging():
-    """Set up logging for responses"""
+    """Set up logging for responses, one JSON record per line"""
     script_name = os.path.splitext(os.path.basename(__file__))[0]
     timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = f"{script_name}_responses_{timestamp}.json"
+    log_file = f"{script_name}_responses_{timestamp}.jsonl"
     
-    log_data = []
+    # Binary appends, flushed after every record so each one reaches the file as soon as it is logged
+    log_handle = open(log_file, 'ab')
+    atexit.register(log_handle.close)
+    dumps = orjson.dumps if orjson else (lambda entry: json.dumps(entry).encode())
     
     def log_response(scenario, argument, distilled_factors):
         log_entry = {
@@ -206,14 +278,88 @@ def setup_logging():
             "argument": argument,
             "distilled_factors": distilled_factors
         }
-        log_data.append(log_entry)
         
-        # Write to file immediately to prevent data loss
-        with open(log_file, 'w') as f:
-            json.dump(log_data, f, indent=2)
+        # Append only this record instead of rewriting the whole log
+        log_handle.write(dumps(log_entry) + b'\n')
+        log_handle.flush()
     
     return log_response
 
+class RateLimiter:
+    """Space out calls across threads so at most one starts per interval"""
+    
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+    
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def read_scenarios(csv_file_path):
+    """Read scenario texts from a CSV file, skipping the header row unless it is itself a scenario"""
+    scenarios = []
+    with open(csv_file_path, 'r') as file:
+        csv_reader = csv.reader(file)
+        
+        # Try to skip header row if it exists
+        header = next(csv_reader, None)
+        # Check if this is actually a header or the first scenario
+        if header and any(h.strip().lower().startswith("input scenario") for h in header):
+            # This is a scenario, not a header - process it
+            scenarios.append('\n'.join(header))
+        
+        # Process the rest of the rows
+        for row in csv_reader:
+            if row:  # Skip empty rows
+                scenarios.append('\n'.join(row))
+    return scenarios
+
+def _call_uncached(call, client, model, prompt, system_prompt, **params):
+    return call(client, model, prompt, system_prompt, **params)
+
+def run_scenario(scenario_text, model, openai_client, groq_client, cache=None):
+    """Generate the argument for one scenario and distill its factors; returns (argument, distilled_factors)"""
+    fetch = cache.fetch if cache is not None else _call_uncached
+    
+    # Process scenario with the appropriate client/model
+    if model in ["gpt-4o-mini", "gpt-4o"]:
+        argument_response = fetch(
+            process_with_openai,
+            openai_client, 
+            model, 
+            scenario_text, 
+            Argument_Developer_Agent_Task
+        )
+    else:  # Groq models
+        argument_response = fetch(
+            process_with_groq,
+            groq_client, 
+            model, 
+            scenario_text, 
+            Argument_Developer_Agent_Task
+        )
+    
+    # Extract the last JSON content if present
+    distiller_input = extract_last_json_block(argument_response)
+    
+    # Always use OpenAI for the distiller
+    distiller_response = fetch(
+        process_with_openai,
+        openai_client,
+        "gpt-4.1",
+        distiller_input,
+        Factor_Distiller_Task,
+        temperature=0.6,
+        max_tokens=1000
+    )
+    return argument_response, distiller_response
+
 def main():
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Generate legal arguments using AI models")
@@ -224,6 +370,8 @@ def main():
                                 "qwen-qwq-32b", "deepseek-r1-distill-llama-70b"], 
                         default="gpt-4o-mini", help="Model to use for argument generation")
     parser.add_argument("--input-file", help="Input file with custom scenarios to process")
+    parser.add_argument("--workers", type=int, default=1, help="Scenarios to process concurrently (default: 1)")
+    parser.add_argument("--response-cache", help="Shelve file that stores LLM responses and replays them for repeated requests (default: off)")
     args = parser.parse_args()
     
     # Set up the appropriate clients
@@ -240,127 +388,33 @@ def main():
     # Load input scenarios from CSV file
     csv_file_path = args.input_file if args.input_file else "data/Scenario_Factors.csv"
     print(f"Reading scenarios from: {csv_file_path}")
+    scenarios = read_scenarios(csv_file_path)
     
-    # Read scenarios from CSV
-    with open(csv_file_path, 'r') as file:
-        csv_reader = csv.reader(file)
-        
-        # Try to skip header row if it exists
-        try:
-            header = next(csv_reader)
-            # Check if this is actually a header or the first scenario
-            if header and any(h.strip().lower().startswith("input scenario") for h in header):
-                # This is a scenario, not a header - process it
-                scenario_text = '\n'.join(header)
-                
-                # Process scenario with the appropriate client/model
-                if args.model in ["gpt-4o-mini", "gpt-4o"]:
-                    argument_response = process_with_openai(
-                        openai_client, 
-                        args.model, 
-                        scenario_text, 
-                        Argument_Developer_Agent_Task
-                    )
-                else:  # Groq models
-                    argument_response = process_with_groq(
-                        groq_client, 
-                        args.model, 
-                        scenario_text, 
-                        Argument_Developer_Agent_Task
-                    )
-                
-                # Extract the last JSON content if present
-                pattern = r'```json(.*?)```'
-                matches = re.findall(pattern, argument_response, re.DOTALL)
-                
-                if matches:
-                    # Get the last match (last JSON snippet)
-                    json_content = matches[-1].strip()
-                    distiller_input = json_content
-                else:
-                    distiller_input = argument_response
-                
-                # Always use OpenAI for the distiller
-                distiller_response = process_with_openai(
-                    openai_client,
-                    "gpt-4.1",
-                    distiller_input,
-                    Factor_Distiller_Task,
-                    temperature=0.6,
-                    max_tokens=1000
-                )
-                
-                # Log the responses
-                log_response(scenario_text, argument_response, distiller_response)
-                
-                # Print the responses
-                print("\nArgument Response:")
-                print(argument_response)
-                print("\nDistilled Factors:")
-                print(distiller_response)
-                print("-" * 80)
-                
-                time.sleep(1)  # Rate limiting
-                
-        except StopIteration:
-            # File is empty
-            pass
-                
-        # Process the rest of the rows
-        for row in csv_reader:
-            if row:  # Skip empty rows
-                scenario_text = '\n'.join(row)
-                
-                print(f"\nProcessing scenario:\n{scenario_text}\n")
-                
-                # Process scenario with the appropriate client/model
-                if args.model in ["gpt-4o-mini", "gpt-4o"]:
-                    argument_response = process_with_openai(
-                        openai_client, 
-                        args.model, 
-                        scenario_text, 
-                        Argument_Developer_Agent_Task
-                    )
-                else:  # Groq models
-                    argument_response = process_with_groq(
-                        groq_client, 
-                        args.model, 
-                        scenario_text, 
-                        Argument_Developer_Agent_Task
-                    )
-                
-                # Extract the last JSON content if present
-                pattern = r'```json(.*?)```'
-                matches = re.findall(pattern, argument_response, re.DOTALL)
-                
-                if matches:
-                    # Get the last match (last JSON snippet)
-                    json_content = matches[-1].strip()
-                    distiller_input = json_content
-                else:
-                    distiller_input = argument_response
-                
-                # Always use OpenAI for the distiller
-                distiller_response = process_with_openai(
-                    openai_client,
-                    "gpt-4.1",
-                    distiller_input,
-                    Factor_Distiller_Task,
-                    temperature=0.6,
-                    max_tokens=1000
-                )
-                
-                # Log the responses
-                log_response(scenario_text, argument_response, distiller_response)
-                
-                # Print the responses
-                print("\nArgument Response:")
-                print(argument_response)
-                print("\nDistilled Factors:")
-                print(distiller_response)
-                print("-" * 80)
-                
-                time.sleep(1)  # Rate limiting
+    # The work is network-bound, so scenarios run on a thread pool; the rate limiter
+    # spaces out scenario starts instead of sleeping between sequential scenarios
+    rate_limiter = RateLimiter(_MIN_SCENARIO_INTERVAL)
+    cache = ResponseCache(args.response_cache) if args.response_cache else None
+    if cache is not None:
+        print(f"Replaying cached responses from: {args.response_cache}")
+    
+    def run_one(scenario_text):
+        rate_limiter.wait()
+        return run_scenario(scenario_text, args.model, openai_client, groq_client, cache)
+    
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        # map yields results in input order, so the log matches the input file row for row
+        for scenario_text, (argument_response, distiller_response) in zip(scenarios, executor.map(run_one, scenarios)):
+            print(f"\nProcessing scenario:\n{scenario_text}\n")
+            
+            # Log the responses
+            log_response(scenario_text, argument_response, distiller_response)
+            
+            # Print the responses
+            print("\nArgument Response:")
+            print(argument_response)
+            print("\nDistilled Factors:")
+            print(distiller_response)
+            print("-" * 80)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file